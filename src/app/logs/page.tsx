@@ -5,7 +5,7 @@ import { PageHeader } from '@/components/page-header';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { BarChart3, Loader2, ServerCrash } from 'lucide-react';
 import { useEffect, useState } from 'react';
-import { getSystemLogs, LogEntry } from '@/services/system-service';
+import { queryLogs, LogEntry } from '@/services/system-service';
 import { useToast } from '@/hooks/use-toast';
 import { Button } from '@/components/ui/button';
 import { RefreshCw } from 'lucide-react';
@@ -20,8 +20,8 @@ export default function LogsPage() {
     setIsLoading(true);
     setError(null);
     try {
-      const fetchedLogs = await getSystemLogs();
-      setLogs(fetchedLogs.reverse()); // Reverse to show most recent first
+      const { entries } = await queryLogs({ limit: 200 }); // Most recent first
+      setLogs(entries);
     } catch (err) {
       const errorMessage = err instanceof Error ? err.message : "An unknown error occurred";
       setError(errorMessage);
@@ -105,8 +105,8 @@ export default function LogsPage() {
             ) : logs.length === 0 ? (
                 <p className="text-center text-muted-foreground py-10">No log entries found.</p>
             ) : (
-              logs.map((log, index) => (
-                <div key={index} className="flex items-start space-x-3 mb-1 p-1 rounded">
+              logs.map((log) => (
+                <div key={log.id} className="flex items-start space-x-3 mb-1 p-1 rounded">
                   <span className="text-muted-foreground tabular-nums">[{new Date(log.timestamp).toLocaleString()}]</span>
                   <span className={`font-bold w-12 text-center px-1 rounded-sm ${getLogLevelBadgeClass(log.level)}`}>{log.level}</span>
                   <span className="flex-1 whitespace-pre-wrap break-words">{log.message}</span>
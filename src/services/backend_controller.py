@@ -4,64 +4,192 @@
 # It uses systemd for robust control and a hybrid modem detection method.
 # It prioritizes network interface detection and uses ModemManager as an optional enhancer.
 
+# Only modules needed by every action are imported here. Everything else is imported
+# inside the functions that use it, so the frequent read-only UI calls start fast.
 import sys
 import json
-import subprocess
 import os
-import random
-import string
 from pathlib import Path
-import shutil
 import datetime
-import re
-import signal
+import functools
+import atexit
 
 # --- Configuration ---
 # Writable directory in the user's home folder for application state.
+# Created on first write (see ensure_state_dir), not at import time.
 STATE_DIR = Path(os.path.expanduser("~")) / ".proxy_pilot_state"
-STATE_DIR.mkdir(exist_ok=True)
 PROXY_CONFIGS_FILE = STATE_DIR / "proxy_configs.json"
+PROXY_CONFIGS_LOCK_FILE = STATE_DIR / "proxy_configs.lock"
 TUNNEL_PIDS_FILE = STATE_DIR / "tunnel_pids.json"
+# Legacy JSON-lines log, imported into LOG_DB_FILE on first use.
 LOG_FILE = STATE_DIR / "activity.log"
+LOG_DB_FILE = STATE_DIR / "activity.db"
+# Touched after each retention pass over LOG_DB_FILE; its mtime is the time of the last pass.
+LOG_PRUNED_MARKER_FILE = STATE_DIR / "activity.pruned"
+MODEM_INVENTORY_FILE = STATE_DIR / "modem_inventory.json"
+MODEM_PATHS_FILE = STATE_DIR / "modem_paths.json"
+SMS_DB_FILE = STATE_DIR / "sms.db"
+QUOTA_USAGE_FILE = STATE_DIR / "quota_usage.json"
+# Number of entries returned by get_logs, and retention of the activity history.
 LOG_MAX_ENTRIES = 200
+LOG_RETENTION_DAYS = 180
+# Minimum time between retention passes, in seconds.
+LOG_PRUNE_INTERVAL = 3600
+LOG_PAGE_SIZE = 100
+# Proxy config keys whose values are never written to the activity log.
+CREDENTIAL_CONFIG_KEYS = ('username', 'password')
 
 
 # Writable directory for 3proxy .cfg files.
 THREPROXY_CONFIG_DIR = Path("/etc/3proxy/conf")
+# First line of every generated config; only files carrying it are ever removed by the reconciler.
+GENERATED_CONFIG_MARKER = "# Dynamically generated by Proxy Pilot"
 
 
 # Port and credential generation config
 PORT_RANGE_START = 30000
 PORT_RANGE_END = 31000
 
+# Maximum number of systemctl calls the reconciler runs in parallel.
+RECONCILE_MAX_WORKERS = 8
+
+# Maximum number of modems whose SMS inboxes are synced in parallel.
+SMS_SYNC_MAX_WORKERS = 4
+SMS_PAGE_SIZE = 50
+
+# How often the inventory watcher runs the quota check, in seconds.
+QUOTA_CHECK_INTERVAL = 5
+
+# Bandwidth a throttled proxy is limited to when its quota has no "throttleKbps", in kbps.
+QUOTA_DEFAULT_THROTTLE_KBPS = 256
+
 # --- Logging Helper ---
-def log_message(level, message):
-    """Appends a log message to the activity log file."""
+# Log records are structured (interface, action, duration, outcome) and stored in an
+# indexed SQLite database. Records are queued in memory and written in a single
+# transaction by flush_log(), which runs after the action's result is printed (and at exit).
+# The UI waits for the process to exit, so calls that queue nothing (successful read-only
+# polls) never open the database, and expired records are only pruned once per LOG_PRUNE_INTERVAL.
+_pending_log_entries = []
+
+def log_message(level, message, interface=None, action=None, duration_ms=None, outcome=None):
+    """Queues a structured log record for the activity history."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    _pending_log_entries.append({
+        "timestamp": now.isoformat(),
+        "ts": now.timestamp(),
+        "level": level,
+        "message": message,
+        "interface": interface,
+        "action": action,
+        "durationMs": duration_ms,
+        "outcome": outcome,
+    })
+
+def open_log_store():
+    """Opens the activity history database, creating its schema on first use."""
+    import sqlite3
+    ensure_state_dir()
+    conn = sqlite3.connect(LOG_DB_FILE, timeout=10)
+    conn.row_factory = sqlite3.Row
+    # WAL lets concurrent invocations read while one writes, and avoids an fsync per commit.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= 1:
+        return conn
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS activity_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts REAL NOT NULL,
+            timestamp TEXT NOT NULL,
+            level TEXT NOT NULL,
+            message TEXT NOT NULL,
+            interface TEXT,
+            action TEXT,
+            duration_ms REAL,
+            outcome TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_log_ts ON activity_log (ts);
+        CREATE INDEX IF NOT EXISTS idx_log_level_ts ON activity_log (level, ts);
+        CREATE INDEX IF NOT EXISTS idx_log_interface_ts ON activity_log (interface, ts);
+        CREATE INDEX IF NOT EXISTS idx_log_action_ts ON activity_log (action, ts);
+        PRAGMA user_version = 1;
+    """)
+    if LOG_FILE.exists():
+        import_legacy_log(conn)
+    return conn
+
+def import_legacy_log(conn):
+    """Moves entries from the old activity.log JSON-lines file into the database."""
+    import re
+    entries = []
+    with open(LOG_FILE, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            ts = parse_iso_timestamp(entry.get('timestamp')) if isinstance(entry, dict) else None
+            if ts is not None:
+                entry['ts'] = ts
+                # Old "Updated config ... with: {...}" records held proxy credentials in clear text.
+                entry['message'] = re.sub(
+                    rf"""(['"](?:{'|'.join(CREDENTIAL_CONFIG_KEYS)})['"]: )(['"]).*?\2""",
+                    r"\1'<redacted>'", str(entry.get('message', '')))
+                entries.append(entry)
+    with conn:
+        insert_log_entries(conn, entries)
+    LOG_FILE.unlink()
+
+def insert_log_entries(conn, entries):
+    """Inserts log records."""
+    conn.executemany(
+        "INSERT INTO activity_log (ts, timestamp, level, message, interface, action, duration_ms, outcome) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(e['ts'], e['timestamp'], e['level'], e['message'], e.get('interface'), e.get('action'),
+          e.get('durationMs'), e.get('outcome')) for e in entries]
+    )
+
+def is_log_prune_due(now):
+    """Returns True if the last retention pass was more than LOG_PRUNE_INTERVAL ago."""
     try:
-        timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat()
-        log_entry = json.dumps({"timestamp": timestamp, "level": level, "message": message})
-        
-        lines = []
-        if LOG_FILE.exists():
-            with open(LOG_FILE, 'r') as f:
-                lines = f.readlines()
-        
-        while len(lines) >= LOG_MAX_ENTRIES:
-            lines.pop(0)
-            
-        lines.append(log_entry + '\n')
-        
-        with open(LOG_FILE, 'w') as f:
-            f.writelines(lines)
+        return now - LOG_PRUNED_MARKER_FILE.stat().st_mtime >= LOG_PRUNE_INTERVAL
+    except FileNotFoundError:
+        return True
 
+def flush_log():
+    """Writes queued log records to the activity history, dropping expired ones now and then."""
+    if not _pending_log_entries:
+        return
+    entries = _pending_log_entries[:]
+    del _pending_log_entries[:len(entries)]
+    try:
+        conn = open_log_store()
+        try:
+            now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+            prune = is_log_prune_due(now)
+            with conn:
+                insert_log_entries(conn, entries)
+                if prune:
+                    conn.execute("DELETE FROM activity_log WHERE ts < ?", (now - LOG_RETENTION_DAYS * 86400,))
+            if prune:
+                LOG_PRUNED_MARKER_FILE.touch()
+        finally:
+            conn.close()
     except Exception as e:
         sys.stderr.write(f"Logging failed: {e}\n")
 
+atexit.register(flush_log)
+
 
 # --- Helper Functions ---
 
+def ensure_state_dir():
+    """Creates the state directory if it does not exist yet."""
+    STATE_DIR.mkdir(exist_ok=True)
+
 def run_command(command_list, use_sudo=False, timeout=15):
     """Executes a shell command and returns its output or raises an error."""
+    import subprocess
     try:
         result = subprocess.run(
             command_list,
@@ -98,20 +226,84 @@ def run_and_parse_json(command_list, use_sudo=False, timeout=15):
         log_message("ERROR", f"Failed to parse JSON from command: {' '.join(command_list)}")
         raise Exception(f"Failed to parse JSON from command: {' '.join(command_list)}\nOutput: {raw_output}")
 
-def read_state_file(file_path, default_value={}):
-    """Reads a JSON state file."""
+def read_state_file(file_path, default_value=None, strict=False):
+    """Reads a JSON state file.
+    With `strict`, a file that exists but cannot be read or parsed raises instead of
+    returning the default, so callers never overwrite real state with an empty one."""
+    if default_value is None:
+        # A fresh dict per call, so callers can safely mutate the result.
+        default_value = {}
     if not file_path.exists():
         return default_value
     try:
         with open(file_path, 'r') as f:
             return json.load(f)
-    except (json.JSONDecodeError, IOError, FileNotFoundError):
+    except FileNotFoundError:
+        return default_value
+    except (json.JSONDecodeError, IOError) as e:
+        if strict:
+            raise Exception(f"State file {file_path} is unreadable or corrupt, refusing to continue: {e}")
         return default_value
 
 def write_state_file(file_path, data):
-    """Writes data to a JSON state file."""
-    with open(file_path, 'w') as f:
-        json.dump(data, f, indent=4)
+    """Atomically writes data to a JSON state file, so readers never see a partial file."""
+    import tempfile
+    ensure_state_dir()
+    fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+class ProxyConfigsLock:
+    """Exclusive flock held around every read-modify-write of proxy_configs.json.
+
+    The UI's CLI calls and the long-running inventory watcher update the file concurrently;
+    atomic writes prevent torn files but not lost updates. The lock is re-entrant within a
+    process, so a locked caller can run the reconciler, which takes it too."""
+    _depth = 0
+    _file = None
+
+    def __enter__(self):
+        import fcntl
+        if ProxyConfigsLock._depth == 0:
+            ensure_state_dir()
+            ProxyConfigsLock._file = open(PROXY_CONFIGS_LOCK_FILE, 'a')
+            fcntl.flock(ProxyConfigsLock._file, fcntl.LOCK_EX)
+        ProxyConfigsLock._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        ProxyConfigsLock._depth -= 1
+        if ProxyConfigsLock._depth == 0:
+            # Closing the file releases the lock.
+            ProxyConfigsLock._file.close()
+            ProxyConfigsLock._file = None
+        return False
+
+def parse_iso_timestamp(value):
+    """Parses an ISO 8601 timestamp to epoch seconds, or returns None if it is not one.
+    Normalizes 'Z' and ModemManager-style '+HH' / '+HHMM' offsets, which datetime.fromisoformat
+    only accepts from Python 3.11 on. Timestamps without an offset are taken as UTC."""
+    import re
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    if value[-1:] in ('Z', 'z'):
+        value = value[:-1] + '+00:00'
+    # Only rewrite an offset that follows a time, so a bare date like '2024-05-01' is left alone.
+    value = re.sub(r'(\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)([+-]\d{2}):?(\d{2})?$',
+                   lambda m: f"{m.group(1)}{m.group(2)}:{m.group(3) or '00'}", value)
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
 
 def get_or_create_proxy_config(interface_name, all_configs):
     """Gets existing config or creates a new one with an available port."""
@@ -132,8 +324,10 @@ def get_or_create_proxy_config(interface_name, all_configs):
         "type": "3proxy",
         "bindIp": None,
         "customName": None,
+        # Newly discovered modems get their proxy started by the reconciler right away.
+        "enabled": True,
     }
-    log_message("INFO", f"Generated new proxy config for {interface_name} on port {new_port}.")
+    log_message("INFO", f"Generated new proxy config for {interface_name} on port {new_port}.", interface=interface_name)
     return new_config, True
 
 def generate_3proxy_config_content(config, ip_address):
@@ -144,57 +338,340 @@ def generate_3proxy_config_content(config, ip_address):
     # Check for non-empty username and password
     is_authenticated = config.get('username') and config.get('password')
 
-    auth_lines = ""
+    # 3proxy's default "auth none" skips ACL evaluation entirely, which would ignore both the
+    # allow rule and the bandlim rules below, so an auth mode is always set.
     if is_authenticated:
         auth_lines = f"""
+auth strong
 users {config['username']}:CL:{config['password']}
 allow {config['username']}
+"""
+    else:
+        auth_lines = """
+auth iponly
+allow *
+"""
+
+    # Bandwidth limits must precede the service lines to apply to them.
+    bandlim_lines = ""
+    rate_kbps = get_proxy_rate_limit_kbps(config)
+    if rate_kbps:
+        bandlim_lines = f"""
+# Bandwidth limit ({rate_kbps} kbps)
+bandlimin {rate_kbps * 1000} *
+bandlimout {rate_kbps * 1000} *
 """
 
     return f"""
-# Dynamically generated by Proxy Pilot for interface with IP {ip_address}
+{GENERATED_CONFIG_MARKER} for interface with IP {ip_address}
 daemon
 nserver 8.8.8.8
 nserver 8.8.4.4
 nscache 65536
 timeouts 1 5 30 60 180 1800 15 60
-{auth_lines}
+{auth_lines}{bandlim_lines}
 # HTTP and SOCKS5 proxy service on the same port
 proxy -p{config['port']} -i127.0.0.1 -e{ip_address}
 socks -p{config['port']} -i127.0.0.1 -e{ip_address}
 """
 
-def write_3proxy_config_file(interface_name, ip_address):
-    """Generates and writes the 3proxy config file for a given interface."""
+def is_generated_3proxy_config(config_file_path):
+    """Returns True if a .cfg file was written by Proxy Pilot (starts with its header)."""
     try:
-        THREPROXY_CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-        all_configs = read_state_file(PROXY_CONFIGS_FILE)
+        with open(config_file_path, 'r') as f:
+            return f.read(256).lstrip().startswith(GENERATED_CONFIG_MARKER)
+    except (IOError, OSError):
+        return False
+
+def hash_content(content):
+    """Returns the SHA-256 hex digest of a config string."""
+    import hashlib
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def get_3proxy_config_hash(interface_name):
+    """Returns the hash of the on-disk 3proxy config for an interface, or None if missing."""
+    try:
+        with open(THREPROXY_CONFIG_DIR / f"{interface_name}.cfg", 'r') as f:
+            return hash_content(f.read())
+    except (IOError, FileNotFoundError):
+        return None
+
+def write_3proxy_config_file(interface_name, ip_address, all_configs=None):
+    """Generates and writes the 3proxy config file for a given interface.
+    Returns (path, changed); the file is left untouched if its content is already current."""
+    try:
+        if all_configs is None:
+            all_configs = read_state_file(PROXY_CONFIGS_FILE, strict=True)
         interface_config = all_configs.get(interface_name)
-        
+
         if not interface_config:
             raise Exception(f"No configuration found for {interface_name}")
-            
+
         config_content = generate_3proxy_config_content(interface_config, ip_address)
         if not config_content:
             raise Exception(f"Could not generate config content for {interface_name} with IP {ip_address}")
-            
+
         config_file_path = THREPROXY_CONFIG_DIR / f"{interface_name}.cfg"
-        
+        if get_3proxy_config_hash(interface_name) == hash_content(config_content):
+            return str(config_file_path), False
+
+        THREPROXY_CONFIG_DIR.mkdir(parents=True, exist_ok=True)
         with open(config_file_path, 'w') as f:
             f.write(config_content)
-        log_message("INFO", f"Wrote 3proxy config for {interface_name} to {config_file_path}.")
-        return str(config_file_path)
+        log_message("INFO", f"Wrote 3proxy config for {interface_name} to {config_file_path}.", interface=interface_name)
+        return str(config_file_path), True
     except Exception as e:
-        log_message("ERROR", f"Failed to write 3proxy config for {interface_name}: {e}")
+        log_message("ERROR", f"Failed to write 3proxy config for {interface_name}: {e}", interface=interface_name)
         raise Exception(f"Failed to write 3proxy config for {interface_name}: {e}")
 
+# --- Modem Inventory ---
+# Kernel drivers used by USB cellular modems in ethernet mode (RNDIS/ECM/NCM/MBIM/QMI).
+MODEM_NET_DRIVERS = {
+    'cdc_ether', 'rndis_host', 'cdc_ncm', 'huawei_cdc_ncm', 'cdc_mbim',
+    'qmi_wwan', 'sierra_net', 'cdc_subset', 'GobiNet',
+}
+SYSFS_NET_DIR = Path("/sys/class/net")
+ARPHRD_PPP = 512
+SIOCGIFADDR = 0x8915
+NETLINK_KOBJECT_UEVENT = 15
+RTMGRP_IPV4_IFADDR = 0x10
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+
+def read_sysfs_value(path):
+    """Reads a single sysfs attribute, returning None if it does not exist."""
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except (IOError, OSError):
+        return None
+
+def read_net_device(ifname):
+    """Reads the driver, bus and USB identity of a network interface from sysfs."""
+    iface_dir = SYSFS_NET_DIR / ifname
+    device_dir = iface_dir / "device"
+    device = {
+        "interfaceName": ifname,
+        "address": read_sysfs_value(iface_dir / "address"),
+        "type": int(read_sysfs_value(iface_dir / "type") or 0),
+        "devtype": None,
+        "driver": None,
+        "bus": None,
+        "usbPath": None,
+        "vendorId": None,
+        "productId": None,
+    }
+
+    for line in (read_sysfs_value(iface_dir / "uevent") or '').splitlines():
+        if line.startswith("DEVTYPE="):
+            device['devtype'] = line.split("=", 1)[1]
+
+    if device_dir.exists():
+        try:
+            device['driver'] = os.path.basename(os.readlink(device_dir / "driver"))
+        except OSError:
+            # No driver bound, or the device was unplugged while it was being read.
+            pass
+        # For USB net devices 'device' is the USB interface (e.g. 1-1.2:1.0);
+        # its parent is the USB device holding the vendor/product IDs.
+        usb_device_dir = os.path.dirname(os.path.realpath(device_dir))
+        vendor_id = read_sysfs_value(os.path.join(usb_device_dir, "idVendor"))
+        if vendor_id:
+            device['bus'] = 'usb'
+            device['usbPath'] = os.path.basename(usb_device_dir)
+            device['vendorId'] = vendor_id
+            device['productId'] = read_sysfs_value(os.path.join(usb_device_dir, "idProduct"))
+    return device
+
+def is_modem_device(device):
+    """Classifies a network device as a modem by its driver and bus rather than its name."""
+    if device['type'] == ARPHRD_PPP or device['devtype'] == 'wwan':
+        return True
+    return device['bus'] == 'usb' and device['driver'] in MODEM_NET_DRIVERS
+
+def scan_modem_inventory():
+    """Builds the modem device table from sysfs without forking any commands."""
+    inventory = {}
+    try:
+        ifnames = os.listdir(SYSFS_NET_DIR)
+    except OSError:
+        return inventory
+    for ifname in ifnames:
+        device = read_net_device(ifname)
+        if is_modem_device(device):
+            inventory[ifname] = device
+    return inventory
+
+def load_modem_inventory():
+    """Returns the modem device table, preferring the one kept current by the inventory watcher."""
+    state = read_state_file(MODEM_INVENTORY_FILE)
+    if state and is_pid_running(state.get('pid')):
+        return state.get('devices', {})
+    return scan_modem_inventory()
+
+def save_modem_inventory(devices):
+    """Writes the watcher's device table."""
+    write_state_file(MODEM_INVENTORY_FILE, {
+        "pid": os.getpid(),
+        "updatedAt": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "devices": devices,
+    })
+
+def get_interface_ipv4(ifname):
+    """Returns the IPv4 address of an interface via ioctl, or None if it has none."""
+    import fcntl
+    import socket
+    import struct
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            ifreq = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, struct.pack('256s', ifname[:15].encode()))
+        return socket.inet_ntoa(ifreq[20:24])
+    except OSError:
+        return None
+
+def parse_uevent(data):
+    """Parses a kernel uevent ('action@devpath\\0KEY=VALUE\\0...') into a dict."""
+    parts = data.split(b'\0')
+    event = {}
+    for part in parts[1:]:
+        key, sep, value = part.partition(b'=')
+        if sep:
+            event[key.decode(errors='replace')] = value.decode(errors='replace')
+    return event
+
+def get_modem_inventory():
+    """Returns the current modem device table."""
+    try:
+        return {"success": True, "data": list(load_modem_inventory().values())}
+    except Exception as e:
+        log_message("ERROR", f"Failed to read modem inventory: {e}")
+        return {"success": False, "error": str(e)}
+
+def watch_modem_inventory():
+    """Long-running watcher that keeps the modem device table current from kernel events.
+
+    Listens for net device add/remove/rename uevents and IPv4 address changes over netlink.
+    Newly plugged modems get a proxy config (port) immediately, and their proxy is reconciled
+    as soon as they obtain an address, without waiting for a status poll. Traffic quotas are
+    checked every QUOTA_CHECK_INTERVAL seconds. If the kernel drops events (ENOBUFS on a
+    burst), the table is rebuilt from sysfs."""
+    import errno
+    import selectors
+    import signal
+    import socket
+    import struct
+    import time
+
+    devices = scan_modem_inventory()
+    save_modem_inventory(devices)
+    log_message("INFO", f"Modem inventory watcher started with {len(devices)} modem(s).")
+    reconcile_proxies()
+
+    uevent_sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+    uevent_sock.bind((0, 1))
+    addr_sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+    addr_sock.bind((0, RTMGRP_IPV4_IFADDR))
+
+    selector = selectors.DefaultSelector()
+    selector.register(uevent_sock, selectors.EVENT_READ, 'uevent')
+    selector.register(addr_sock, selectors.EVENT_READ, 'addr')
+
+    def handle_sigterm(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+    def remove_device(ifname):
+        if devices.pop(ifname, None):
+            save_modem_inventory(devices)
+            log_message("INFO", f"Modem {ifname} removed.", interface=ifname, action='hotplug_remove')
+
+    def handle_uevent(data):
+        event = parse_uevent(data)
+        if event.get('SUBSYSTEM') != 'net' or not event.get('INTERFACE'):
+            return
+        ifname = event['INTERFACE']
+        action = event.get('ACTION')
+        if action == 'remove':
+            remove_device(ifname)
+        elif action in ('add', 'move'):
+            if action == 'move' and event.get('DEVPATH_OLD'):
+                remove_device(os.path.basename(event['DEVPATH_OLD']))
+            device = read_net_device(ifname)
+            if is_modem_device(device):
+                devices[ifname] = device
+                save_modem_inventory(devices)
+                log_message("INFO", f"Modem {ifname} added (driver {device['driver']}, USB {device['vendorId']}:{device['productId']}).",
+                            interface=ifname, action='hotplug_add')
+                reconcile_proxies(ifname)
+
+    def handle_addr(data):
+        # rtnetlink messages: nlmsghdr (16 bytes) followed by ifaddrmsg (8 bytes).
+        offset = 0
+        while offset + 24 <= len(data):
+            msg_len, msg_type = struct.unpack_from('=IH', data, offset)
+            if msg_len < 16:
+                break
+            if msg_type in (RTM_NEWADDR, RTM_DELADDR):
+                ifindex = struct.unpack_from('=I', data, offset + 20)[0]
+                try:
+                    ifname = socket.if_indextoname(ifindex)
+                except OSError:
+                    ifname = None
+                if ifname in devices:
+                    reconcile_proxies(ifname)
+            offset += (msg_len + 3) & ~3
+
+    def resync():
+        # Events were dropped, so rebuild the table from sysfs and reconcile everything.
+        devices.clear()
+        devices.update(scan_modem_inventory())
+        save_modem_inventory(devices)
+        reconcile_proxies()
+
+    last_quota_check = 0
+    try:
+        while True:
+            if time.monotonic() - last_quota_check >= QUOTA_CHECK_INTERVAL:
+                check_quotas()
+                last_quota_check = time.monotonic()
+            for key, _ in selector.select(timeout=QUOTA_CHECK_INTERVAL):
+                # One bad event (a device gone mid-read, a socket overrun) must not stop
+                # the watcher, since quota enforcement runs from it too.
+                try:
+                    data = key.fileobj.recv(65536)
+                    if key.data == 'uevent':
+                        handle_uevent(data)
+                    else:
+                        handle_addr(data)
+                except OSError as e:
+                    if e.errno == errno.ENOBUFS:
+                        log_message("WARN", f"Netlink {key.data} socket overran, rescanning modems.")
+                        resync()
+                    else:
+                        log_message("WARN", f"Failed to handle {key.data} event: {e}")
+            flush_log()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        selector.close()
+        uevent_sock.close()
+        addr_sock.close()
+        # Readers fall back to scanning sysfs once the table is gone.
+        MODEM_INVENTORY_FILE.unlink(missing_ok=True)
+        log_message("INFO", "Modem inventory watcher stopped.")
+    return {"success": True, "data": {"message": "Modem inventory watcher stopped."}}
+
 # --- Core Logic Functions ---
+@functools.lru_cache(maxsize=None)
 def is_command_available(command):
-    """Check if a command is available on the system."""
+    """Check if a command is available on the system. Cached for the life of the process."""
+    import shutil
     return shutil.which(command) is not None
 
 def get_proxy_status(interface_name):
     """Checks if a 3proxy service for an interface is running."""
+    import subprocess
     try:
         run_command(['systemctl', 'is-active', '--quiet', f"3proxy@{interface_name}.service"])
         return 'running'
@@ -203,6 +680,26 @@ def get_proxy_status(interface_name):
     except Exception:
         return 'error'
 
+def get_proxy_unit_states(interface_names):
+    """Checks the 3proxy units for several interfaces with a single systemctl call.
+    Returns a dict mapping interface name to 'running' or 'stopped'."""
+    import subprocess
+    interface_names = list(interface_names)
+    if not interface_names:
+        return {}
+    units = [f"3proxy@{name}.service" for name in interface_names]
+    try:
+        # 'is-active' exits non-zero when any unit is inactive, so don't use run_command here.
+        result = subprocess.run(['systemctl', 'is-active'] + units, capture_output=True, text=True, timeout=15)
+        states = result.stdout.strip().splitlines()
+    except (subprocess.TimeoutExpired, FileNotFoundError) as e:
+        log_message("ERROR", f"Failed to query 3proxy unit states: {e}")
+        states = []
+    return {
+        name: 'running' if i < len(states) and states[i].strip() == 'active' else 'stopped'
+        for i, name in enumerate(interface_names)
+    }
+
 def get_bandwidth_stats(interface_name):
     """Fetches bandwidth usage for a given interface using vnstat."""
     if not is_command_available("vnstat"):
@@ -242,22 +739,41 @@ def get_bandwidth_stats(interface_name):
     except Exception as e:
         # Check if the error is due to vnstat not having data for the interface
         if "unable to read database" in str(e).lower():
-            log_message("WARN", f"vnstat database for {interface_name} not ready or found.")
+            log_message("WARN", f"vnstat database for {interface_name} not ready or found.", interface=interface_name)
             return {"error": "vnstat_not_ready"}
-        log_message("ERROR", f"Failed to get bandwidth stats for {interface_name}: {e}")
+        log_message("ERROR", f"Failed to get bandwidth stats for {interface_name}: {e}", interface=interface_name)
         return {"error": str(e)}
 
-def get_modems_from_ip_addr():
-    """Detects modem-like network interfaces using the 'ip addr' command. This is the primary method."""
-    modems = {}
+def get_modem_interfaces():
+    """Lists modem network interfaces with their address and link state.
+    Reads the modem inventory table and sysfs, so no commands are forked. Unlike
+    get_modems_from_inventory, it does not query proxy or bandwidth status."""
+    if not SYSFS_NET_DIR.exists():
+        return get_modem_interfaces_from_ip_addr()
+
+    interfaces_by_name = {}
+    for ifname, device in load_modem_inventory().items():
+        interfaces_by_name[ifname] = {
+            "address": device.get('address') or ifname,
+            "operstate": (read_sysfs_value(SYSFS_NET_DIR / ifname / "operstate") or '').upper(),
+            "ipAddress": get_interface_ipv4(ifname),
+            "device": device,
+            "source": "inventory",
+        }
+    return interfaces_by_name
+
+def get_modem_interfaces_from_ip_addr():
+    """Fallback for hosts without sysfs: guesses modem interfaces by name from 'ip addr'."""
+    import re
+    interfaces_by_name = {}
     if not is_command_available("ip"):
         log_message("WARN", "`ip` command not found. Cannot perform primary modem detection.")
-        return modems
+        return interfaces_by_name
 
     try:
         output = run_command(['ip', '-j', 'addr'])
         interfaces = json.loads(output)
-        
+
         modem_interface_pattern = re.compile(r'^(enx|usb|wwan|ppp)')
         excluded_pattern = re.compile(r'^(lo|eth|wlan|docker|veth|br-|cali|vxlan)')
 
@@ -269,27 +785,43 @@ def get_modems_from_ip_addr():
                     if addr_info.get('family') == 'inet':
                         ip_address = addr_info.get('local')
                         break
-                
-                modems[ifname] = {
-                    "id": iface.get('address', ifname),
-                    "name": f"Network Modem ({ifname})", # Generic default name
-                    "interfaceName": ifname,
-                    "status": 'connected' if iface.get('operstate') == 'UP' and ip_address else 'disconnected',
+
+                interfaces_by_name[ifname] = {
+                    "address": iface.get('address', ifname),
+                    "operstate": iface.get('operstate'),
                     "ipAddress": ip_address,
-                    "proxyType": "3proxy",
-                    "proxyStatus": get_proxy_status(ifname),
+                    "device": None,
                     "source": "ip_addr",
-                    "bandwidth": get_bandwidth_stats(ifname)
                 }
     except Exception as e:
         log_message("ERROR", f"Error detecting modems from 'ip addr': {e}")
-    
+
+    return interfaces_by_name
+
+def get_modems_from_inventory():
+    """Detects modem network interfaces from the modem inventory (or 'ip addr' on hosts without
+    sysfs). This is the primary method; ModemManager data is layered on top of it."""
+    modems = {}
+    for ifname, iface in get_modem_interfaces().items():
+        ip_address = iface['ipAddress']
+        modems[ifname] = {
+            "id": iface['address'],
+            "name": f"Network Modem ({ifname})", # Generic default name
+            "interfaceName": ifname,
+            "status": 'connected' if iface['operstate'] == 'UP' and ip_address else 'disconnected',
+            "ipAddress": ip_address,
+            "proxyType": "3proxy",
+            "proxyStatus": get_proxy_status(ifname),
+            "source": iface['source'],
+            "device": iface['device'],
+            "bandwidth": get_bandwidth_stats(ifname)
+        }
     return modems
 
 def enhance_with_mmcli_data(modems_dict):
     """Enhances the modem dictionary with data from ModemManager if available."""
     if not is_command_available("mmcli"):
-        log_message("INFO", "`mmcli` command not found. Skipping mmcli data enhancement.")
+        # ModemManager is optional; not logged, since this runs on every status poll.
         return modems_dict
 
     try:
@@ -317,38 +849,49 @@ def enhance_with_mmcli_data(modems_dict):
     return modems_dict
 
 
+def sync_proxy_configs(interface_ips, proxy_configs):
+    """Ensures every detected interface has a proxy config and an up-to-date bindIp.
+    `interface_ips` maps interface name to its current IP (or None). Updates `proxy_configs`
+    in place and returns True if anything changed."""
+    configs_changed = False
+    for interface_name, ip_address in interface_ips.items():
+        modem_proxy_config, created = get_or_create_proxy_config(interface_name, proxy_configs)
+        if created:
+            proxy_configs[interface_name] = modem_proxy_config
+            configs_changed = True
+
+        current_bind_ip = proxy_configs.get(interface_name, {}).get('bindIp')
+        if ip_address and current_bind_ip != ip_address:
+            proxy_configs.setdefault(interface_name, {})['bindIp'] = ip_address
+            configs_changed = True
+    return configs_changed
+
+
 def get_all_modem_statuses():
     """Retrieves status of all available modems using a hybrid detection method."""
     try:
-        all_modems_dict = get_modems_from_ip_addr()
+        all_modems_dict = get_modems_from_inventory()
         all_modems_dict = enhance_with_mmcli_data(all_modems_dict)
         
         status_list = list(all_modems_dict.values())
         
         if not status_list:
-            log_message("INFO", "No modems detected by any method.")
+            # Not logged: this is the normal state of a host without modems, and it is polled constantly.
             return {"success": True, "data": []}
 
-        proxy_configs = read_state_file(PROXY_CONFIGS_FILE)
-        configs_changed = False
+        interface_ips = {modem['interfaceName']: modem['ipAddress'] for modem in status_list}
+        proxy_configs = read_state_file(PROXY_CONFIGS_FILE, strict=True)
+        if sync_proxy_configs(interface_ips, proxy_configs):
+            # Only lock when something needs writing, so the frequent polls stay lock-free.
+            with ProxyConfigsLock():
+                proxy_configs = read_state_file(PROXY_CONFIGS_FILE, strict=True)
+                if sync_proxy_configs(interface_ips, proxy_configs):
+                    write_state_file(PROXY_CONFIGS_FILE, proxy_configs)
 
         for modem in status_list:
             interface_name = modem['interfaceName']
-            modem_proxy_config, created = get_or_create_proxy_config(interface_name, proxy_configs)
-            if created:
-                proxy_configs[interface_name] = modem_proxy_config
-                configs_changed = True
-            
             if proxy_configs.get(interface_name, {}).get('customName'):
                  modem['name'] = proxy_configs[interface_name]['customName']
-            
-            current_bind_ip = proxy_configs.get(interface_name, {}).get('bindIp')
-            if modem['ipAddress'] and current_bind_ip != modem['ipAddress']:
-                 proxy_configs.setdefault(interface_name, {})['bindIp'] = modem['ipAddress']
-                 configs_changed = True
-
-        if configs_changed:
-            write_state_file(PROXY_CONFIGS_FILE, proxy_configs)
 
         return {"success": True, "data": status_list}
     except Exception as e:
@@ -359,7 +902,7 @@ def get_all_modem_statuses():
 def proxy_action(action, interface_name):
     """Starts, stops, or restarts a 3proxy service, writing config first."""
     try:
-        log_message("INFO", f"Attempting to {action} proxy for {interface_name}.")
+        log_message("INFO", f"Attempting to {action} proxy for {interface_name}.", interface=interface_name)
         if action in ['start', 'restart']:
             statuses_result = get_all_modem_statuses()
             if not statuses_result['success']:
@@ -373,10 +916,384 @@ def proxy_action(action, interface_name):
 
         service_name = f"3proxy@{interface_name}.service"
         run_command(['systemctl', action, service_name])
-        log_message("INFO", f"Proxy {action} successful for {interface_name}.")
+        set_proxy_enabled(interface_name, action != 'stop')
+        log_message("INFO", f"Proxy {action} successful for {interface_name}.", interface=interface_name)
         return {"success": True, "data": {"message": f"Proxy {action} successful for {interface_name}"}}
     except Exception as e:
-        log_message("ERROR", f"Proxy action '{action}' for {interface_name} failed: {e}")
+        log_message("ERROR", f"Proxy action '{action}' for {interface_name} failed: {e}", interface=interface_name)
+        return {"success": False, "error": str(e)}
+
+
+def set_proxy_enabled(interface_name, enabled):
+    """Records whether the proxy for an interface should be running, for the reconciler."""
+    with ProxyConfigsLock():
+        all_configs = read_state_file(PROXY_CONFIGS_FILE, strict=True)
+        if interface_name in all_configs and all_configs[interface_name].get('enabled') != enabled:
+            all_configs[interface_name]['enabled'] = enabled
+            write_state_file(PROXY_CONFIGS_FILE, all_configs)
+
+
+def reconcile_proxies(interface_name=None):
+    """Brings 3proxy config files and units in line with proxy_configs.json and the detected modems.
+
+    Desired state is computed from the modem interfaces, their IPs and the stored proxy configs;
+    actual state from the hashes of the on-disk .cfg files and the unit states. Only configs whose
+    content differs are rewritten, and only units whose config changed or whose state differs from
+    the recorded 'enabled' flag are restarted, started or stopped (in parallel). Generated configs
+    with no entry in proxy_configs.json have their unit stopped and are then removed. Proxies that were
+    never explicitly started or stopped (configs created before the 'enabled' flag existed)
+    keep their current unit state; newly discovered modems are created enabled and started. A running
+    unit whose modem is unplugged or has no IP (its config binds a dead address) is stopped and
+    reported as 'disconnected'; it is started again once the modem has an address. Running it again
+    when nothing has drifted performs no writes and no restarts.
+    If `interface_name` is given, only that interface is reconciled."""
+    from concurrent.futures import ThreadPoolExecutor
+    try:
+        # Held for the whole run, so concurrent reconciles never act on stale configs.
+        with ProxyConfigsLock():
+            interfaces = get_modem_interfaces()
+            proxy_configs = read_state_file(PROXY_CONFIGS_FILE, strict=True)
+            configs_changed = sync_proxy_configs({name: iface['ipAddress'] for name, iface in interfaces.items()}, proxy_configs)
+
+            # Desired state: config content and run state per connected interface.
+            desired = {}
+            for name, iface in interfaces.items():
+                if interface_name and name != interface_name:
+                    continue
+                content = generate_3proxy_config_content(proxy_configs.get(name, {}), iface['ipAddress'])
+                if content:
+                    desired[name] = {"hash": hash_content(content), "enabled": proxy_configs[name].get('enabled')}
+
+            # Generated config files on disk without a matching entry in proxy_configs.json.
+            # Hand-written configs (without the generated header) are never touched.
+            orphans = []
+            if THREPROXY_CONFIG_DIR.exists():
+                orphans = [
+                    path.stem for path in THREPROXY_CONFIG_DIR.glob("*.cfg")
+                    if path.stem not in proxy_configs and (not interface_name or path.stem == interface_name)
+                    and is_generated_3proxy_config(path)
+                ]
+
+            # Configured interfaces whose modem is gone or has no IP to bind to.
+            disconnected = [
+                name for name in proxy_configs
+                if name not in desired and (not interface_name or name == interface_name)
+            ]
+
+            unit_states = get_proxy_unit_states(list(desired) + orphans + disconnected)
+
+            summary = {"written": [], "restarted": [], "started": [], "stopped": [], "removed": [],
+                       "disconnected": [], "failed": []}
+            unit_actions = []
+            for name, state in desired.items():
+                changed = get_3proxy_config_hash(name) != state['hash']
+                if changed:
+                    write_3proxy_config_file(name, interfaces[name]['ipAddress'], proxy_configs)
+                    summary['written'].append(name)
+
+                running = unit_states.get(name) == 'running'
+                if running and state['enabled'] is False:
+                    unit_actions.append(('stop', name))
+                elif running and changed:
+                    unit_actions.append(('restart', name))
+                elif not running and state['enabled'] is True:
+                    unit_actions.append(('start', name))
+
+            for name in orphans:
+                if unit_states.get(name) == 'running':
+                    unit_actions.append(('stop', name))
+
+            for name in disconnected:
+                if unit_states.get(name) != 'running':
+                    continue
+                unit_actions.append(('stop', name))
+                summary['disconnected'].append(name)
+                # The proxy was running, so bring it back once the modem has an address again.
+                if proxy_configs[name].get('enabled') is None:
+                    proxy_configs[name]['enabled'] = True
+                    configs_changed = True
+
+            if configs_changed:
+                write_state_file(PROXY_CONFIGS_FILE, proxy_configs)
+
+            def apply_unit_action(unit_action):
+                action, name = unit_action
+                try:
+                    run_command(['systemctl', action, f"3proxy@{name}.service"])
+                    return action, name, True
+                except Exception:
+                    return action, name, False
+
+            if unit_actions:
+                outcome_keys = {'stop': 'stopped', 'restart': 'restarted', 'start': 'started'}
+                with ThreadPoolExecutor(max_workers=min(RECONCILE_MAX_WORKERS, len(unit_actions))) as executor:
+                    for action, name, ok in executor.map(apply_unit_action, unit_actions):
+                        summary[outcome_keys[action] if ok else 'failed'].append(name)
+
+            # Orphaned configs are only deleted once their unit is known to be stopped,
+            # so a failed stop never leaves a running unit without its config file.
+            for name in orphans:
+                if name in summary['failed']:
+                    continue
+                (THREPROXY_CONFIG_DIR / f"{name}.cfg").unlink()
+                summary['removed'].append(name)
+                log_message("INFO", f"Removed orphaned 3proxy config for {name}.", interface=name)
+
+            summary['unchanged'] = len(desired) - len(summary['written'])
+            if any(summary[key] for key in ('written', 'restarted', 'started', 'stopped', 'removed', 'disconnected', 'failed')):
+                log_message("INFO", f"Reconciled proxies: {summary}", interface=interface_name)
+
+            if summary['failed']:
+                return {"success": False, "error": f"Failed to apply unit changes for: {', '.join(summary['failed'])}", "data": summary}
+            return {"success": True, "data": summary}
+    except Exception as e:
+        log_message("ERROR", f"Proxy reconcile failed: {e}")
+        return {"success": False, "error": str(e)}
+
+
+def find_modem_path(interface_name):
+    """Resolves the ModemManager path for an interface.
+    A cached path is verified with a single mmcli call; the full modem list is only
+    scanned (and the cache refreshed) when the cached path is missing or stale."""
+    cached_paths = read_state_file(MODEM_PATHS_FILE)
+    cached_path = cached_paths.get(interface_name)
+    if cached_path:
+        try:
+            modem_details_data = run_and_parse_json(['mmcli', '-m', cached_path, '-J'], use_sudo=True)
+            if modem_details_data.get('modem', {}).get('generic', {}).get('primary-port') == interface_name:
+                return cached_path
+        except Exception:
+            pass
+
+    modem_list_data = run_and_parse_json(['mmcli', '-L', '-J'], use_sudo=True)
+    modem_mm_path = None
+    for modem_path in modem_list_data.get('modem-list', []):
+        try:
+            modem_details_data = run_and_parse_json(['mmcli', '-m', modem_path, '-J'], use_sudo=True)
+            primary_port = modem_details_data.get('modem', {}).get('generic', {}).get('primary-port')
+            if primary_port:
+                cached_paths[primary_port] = modem_path
+            if primary_port == interface_name:
+                modem_mm_path = modem_path
+                break
+        except Exception:
+            continue
+
+    if modem_mm_path:
+        write_state_file(MODEM_PATHS_FILE, cached_paths)
+    return modem_mm_path
+
+
+# --- SMS Store ---
+# ModemManager SMS states after which a message no longer changes. Messages in any other
+# state (e.g. a multipart message still 'receiving') are fetched again on the next sync.
+SMS_FINAL_STATES = ('received', 'stored', 'sent')
+
+SMS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sms_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        interface TEXT NOT NULL,
+        sms_path TEXT,
+        msg_key TEXT NOT NULL,
+        number TEXT,
+        timestamp TEXT,
+        ts_epoch REAL,
+        text TEXT,
+        state TEXT,
+        pdu_type TEXT,
+        UNIQUE (interface, msg_key)
+    );
+    CREATE INDEX IF NOT EXISTS idx_sms_interface_time ON sms_messages (interface, ts_epoch);
+    CREATE INDEX IF NOT EXISTS idx_sms_interface_path ON sms_messages (interface, sms_path);
+    CREATE INDEX IF NOT EXISTS idx_sms_number ON sms_messages (number);
+    CREATE INDEX IF NOT EXISTS idx_sms_time ON sms_messages (ts_epoch);
+    -- ModemManager SMS paths already fetched in a final state, so each message is read once.
+    CREATE TABLE IF NOT EXISTS sms_seen_paths (
+        interface TEXT NOT NULL,
+        sms_path TEXT NOT NULL,
+        PRIMARY KEY (interface, sms_path)
+    );
+"""
+
+def open_sms_store():
+    """Opens the local SMS database, creating its schema on first use."""
+    import sqlite3
+    ensure_state_dir()
+    conn = sqlite3.connect(SMS_DB_FILE)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SMS_SCHEMA)
+    return conn
+
+def get_sms_key(message):
+    """Identifies a message independently of its ModemManager path, which can be reused.
+    SMSC timestamps only have second precision, so the text is part of the key: two
+    different messages from one sender in the same second are both kept."""
+    return f"{message['number']}|{message['timestamp']}|{hash_content(message['text'])}"
+
+def fetch_new_sms(interface_name, modem_mm_path, seen_paths):
+    """Lists the SIM inbox and fetches only messages whose path is not in `seen_paths`.
+    Returns (listed_paths, new_messages)."""
+    list_result = run_and_parse_json(['mmcli', '-m', modem_mm_path, '--messaging-list-sms', '-J'], use_sudo=True)
+    sms_paths = list_result.get('modem', {}).get('messaging', {}).get('sms', [])
+    new_messages = []
+    for sms_path in sms_paths:
+        if sms_path in seen_paths:
+            continue
+        sms_details = run_and_parse_json(['mmcli', '-s', sms_path, '-J'], use_sudo=True).get('sms', {})
+        content = sms_details.get('content', {})
+        properties = sms_details.get('properties', {})
+        new_messages.append({
+            "path": sms_path,
+            "number": content.get('number', 'Unknown'),
+            "timestamp": properties.get('timestamp', ''),
+            "text": content.get('text', ''),
+            "state": properties.get('state'),
+            "pduType": properties.get('pdu-type'),
+        })
+    return sms_paths, new_messages
+
+def upsert_sms(conn, interface_name, message):
+    """Stores a fetched message. A row previously stored from the same path while the message
+    was incomplete is updated in place (and re-keyed) rather than duplicated."""
+    values = (get_sms_key(message), message['number'], message['timestamp'],
+              parse_iso_timestamp(message['timestamp']), message['text'], message['state'], message['pduType'])
+    final_states = ', '.join('?' * len(SMS_FINAL_STATES))
+    if message['path']:
+        updated = conn.execute(
+            "UPDATE OR IGNORE sms_messages SET msg_key = ?, number = ?, timestamp = ?, ts_epoch = ?, text = ?, "
+            "state = ?, pdu_type = ? "
+            f"WHERE interface = ? AND sms_path = ? AND (state IS NULL OR state NOT IN ({final_states}))",
+            values + (interface_name, message['path']) + SMS_FINAL_STATES
+        ).rowcount
+        if updated:
+            return
+        # The update was ignored because the complete message is already stored; drop the partial copy.
+        conn.execute(
+            f"DELETE FROM sms_messages WHERE interface = ? AND sms_path = ? "
+            f"AND (state IS NULL OR state NOT IN ({final_states}))",
+            (interface_name, message['path']) + SMS_FINAL_STATES
+        )
+    conn.execute(
+        "INSERT OR IGNORE INTO sms_messages "
+        "(interface, sms_path, msg_key, number, timestamp, ts_epoch, text, state, pdu_type) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (interface_name, message['path']) + values
+    )
+
+def store_synced_sms(conn, interface_name, listed_paths, seen_paths, new_messages):
+    """Saves newly fetched messages and updates the seen-path set for an interface.
+    Only messages in a final state are marked as seen; incomplete ones are fetched again.
+    Paths no longer on the SIM are forgotten, so a reused path is fetched again."""
+    final_paths = {m['path'] for m in new_messages if m['state'] in SMS_FINAL_STATES}
+    with conn:
+        for message in new_messages:
+            upsert_sms(conn, interface_name, message)
+        conn.execute("DELETE FROM sms_seen_paths WHERE interface = ?", (interface_name,))
+        conn.executemany(
+            "INSERT INTO sms_seen_paths (interface, sms_path) VALUES (?, ?)",
+            [(interface_name, path) for path in listed_paths if path in seen_paths or path in final_paths]
+        )
+
+def get_seen_sms_paths(conn, interface_name):
+    """Returns the set of SMS paths already fetched for an interface."""
+    rows = conn.execute("SELECT sms_path FROM sms_seen_paths WHERE interface = ?", (interface_name,))
+    return {row['sms_path'] for row in rows}
+
+def sync_sms(interface_names=None):
+    """Fetches new SMS messages into the local store, in parallel across modems.
+    Defaults to every modem interface. Returns a dict of new message counts per interface."""
+    from concurrent.futures import ThreadPoolExecutor
+    if not is_command_available("mmcli"):
+        raise Exception("`mmcli` command not found. This feature requires ModemManager to be installed and managing the modem.")
+    if interface_names is None:
+        interface_names = list(get_modem_interfaces())
+
+    conn = open_sms_store()
+    try:
+        seen_by_interface = {name: get_seen_sms_paths(conn, name) for name in interface_names}
+
+        def fetch(interface_name):
+            try:
+                modem_mm_path = find_modem_path(interface_name)
+                if not modem_mm_path:
+                    return interface_name, None
+                return interface_name, fetch_new_sms(interface_name, modem_mm_path, seen_by_interface[interface_name])
+            except Exception as e:
+                log_message("WARN", f"SMS sync for {interface_name} failed: {e}", interface=interface_name)
+                return interface_name, None
+
+        new_counts = {}
+        if interface_names:
+            with ThreadPoolExecutor(max_workers=min(SMS_SYNC_MAX_WORKERS, len(interface_names))) as executor:
+                for interface_name, fetched in executor.map(fetch, interface_names):
+                    if fetched is None:
+                        continue
+                    listed_paths, new_messages = fetched
+                    store_synced_sms(conn, interface_name, listed_paths, seen_by_interface[interface_name], new_messages)
+                    new_counts[interface_name] = len(new_messages)
+        return new_counts
+    finally:
+        conn.close()
+
+def search_sms(filters):
+    """Queries the local SMS store.
+    Supported filters: interface, number, text (substring), since/until (ISO timestamps),
+    limit (None for no limit) and offset. Results are newest first."""
+    clauses, params = [], []
+    if filters.get('interface'):
+        clauses.append("interface = ?")
+        params.append(filters['interface'])
+    if filters.get('number'):
+        clauses.append("number = ?")
+        params.append(filters['number'])
+    if filters.get('text'):
+        clauses.append("text LIKE ?")
+        params.append(f"%{filters['text']}%")
+    for key, operator in (('since', '>='), ('until', '<=')):
+        if filters.get(key):
+            epoch = parse_iso_timestamp(filters[key])
+            if epoch is None:
+                raise Exception(f"Invalid '{key}' timestamp: {filters[key]}")
+            clauses.append(f"ts_epoch {operator} ?")
+            params.append(epoch)
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    limit = filters.get('limit', SMS_PAGE_SIZE)
+    limit = -1 if limit is None else int(limit)
+    offset = int(filters.get('offset', 0))
+
+    conn = open_sms_store()
+    try:
+        rows = conn.execute(
+            f"SELECT id, interface, number, timestamp, text FROM sms_messages {where} "
+            "ORDER BY ts_epoch DESC, id DESC LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+    finally:
+        conn.close()
+
+    return [{
+        "id": str(row['id']),
+        "interfaceName": row['interface'],
+        "from": row['number'],
+        "timestamp": row['timestamp'],
+        "content": row['text'],
+    } for row in rows]
+
+
+def sms_store_action(action, args_json):
+    """Handles SMS store actions that are not tied to a single modem."""
+    try:
+        args = json.loads(args_json)
+        if action == 'sync-sms':
+            new_counts = sync_sms(args.get('interfaces'))
+            log_message("INFO", f"Synced SMS inboxes: {new_counts}")
+            return {"success": True, "data": new_counts}
+        elif action == 'search-sms':
+            return {"success": True, "data": search_sms(args)}
+        return {"success": False, "error": "Unknown SMS action"}
+    except Exception as e:
+        log_message("ERROR", f"SMS action '{action}' failed: {e}")
         return {"success": False, "error": str(e)}
 
 
@@ -384,22 +1301,21 @@ def modem_action(action, interface_name, args_json):
     """Handles SMS and USSD actions by finding the correct modem path."""
     try:
         args = json.loads(args_json)
-        log_message("INFO", f"Performing modem action '{action}' for {interface_name}.")
+        log_message("INFO", f"Performing modem action '{action}' for {interface_name}.", interface=interface_name)
         
         if not is_command_available("mmcli"):
             raise Exception("`mmcli` command not found. This feature requires ModemManager to be installed and managing the modem.")
 
-        modem_list_data = run_and_parse_json(['mmcli', '-L', '-J'], use_sudo=True)
-        modem_mm_path = None
-        for modem_path in modem_list_data.get('modem-list', []):
-            try:
-                modem_details_data = run_and_parse_json(['mmcli', '-m', modem_path, '-J'], use_sudo=True)
-                if modem_details_data.get('modem', {}).get('generic', {}).get('primary-port') == interface_name:
-                    modem_mm_path = modem_path
-                    break
-            except Exception:
-                continue
-        
+        if action == 'read-sms':
+            # Served from the local store; only messages not fetched before hit mmcli.
+            if args.get('sync', True):
+                sync_sms([interface_name])
+            # The inbox view has no paging, so it gets every message unless a limit is given.
+            messages = search_sms({'limit': None, **args, 'interface': interface_name})
+            log_message("INFO", f"Read {len(messages)} SMS messages from {interface_name}.", interface=interface_name)
+            return {"success": True, "data": messages}
+
+        modem_mm_path = find_modem_path(interface_name)
         if not modem_mm_path:
             raise Exception(f"Could not find modem with interface '{interface_name}' managed by ModemManager. This action requires mmcli.")
 
@@ -410,40 +1326,23 @@ def modem_action(action, interface_name, args_json):
                 raise Exception("Failed to create SMS. The modem may be busy or not registered.")
             run_command(['mmcli', '-s', sms_path, '--send'], use_sudo=True)
             run_command(['mmcli', '-m', modem_mm_path, f'--messaging-delete-sms={sms_path.split("/")[-1]}'], use_sudo=True)
-            log_message("INFO", f"SMS sent to {args['recipient']} via {interface_name}.")
+            log_message("INFO", f"SMS sent to {args['recipient']} via {interface_name}.", interface=interface_name)
             return {"success": True, "data": {"message": "SMS sent successfully."}}
 
-        elif action == 'read-sms':
-            list_result = run_and_parse_json(['mmcli', '-m', modem_mm_path, '--messaging-list-sms', '-J'], use_sudo=True)
-            sms_paths = list_result.get('modem', {}).get('messaging', {}).get('sms', [])
-            messages = []
-            for sms_path in sms_paths:
-                sms_details_data = run_and_parse_json(['mmcli', '-s', sms_path, '-J'], use_sudo=True)
-                sms_details = sms_details_data.get('sms', {})
-                content = sms_details.get('content', {})
-                messages.append({
-                    "id": sms_path.split('/')[-1],
-                    "from": content.get('number', 'Unknown'),
-                    "timestamp": sms_details.get('properties', {}).get('timestamp', ''),
-                    "content": content.get('text', '')
-                })
-            log_message("INFO", f"Read {len(messages)} SMS messages from {interface_name}.")
-            return {"success": True, "data": messages}
-
         elif action == 'send-ussd':
             response_str = run_command(['mmcli', '-m', modem_mm_path, f'--3gpp-ussd-initiate={args["ussdCode"]}'], use_sudo=True)
-            log_message("INFO", f"USSD command '{args['ussdCode']}' sent via {interface_name}.")
+            log_message("INFO", f"USSD command '{args['ussdCode']}' sent via {interface_name}.", interface=interface_name)
             return {"success": True, "data": {"response": response_str}}
             
         return {"success": False, "error": "Unknown modem action"}
     except Exception as e:
-        log_message("ERROR", f"Modem action '{action}' for {interface_name} failed: {e}")
+        log_message("ERROR", f"Modem action '{action}' for {interface_name} failed: {e}", interface=interface_name)
         return {"success": False, "error": str(e)}
 
 def rotate_ip(interface_name):
     """Disconnects and reconnects a modem to get a new IP, then restarts the proxy."""
     try:
-        log_message("INFO", f"Attempting IP rotation for {interface_name}.")
+        log_message("INFO", f"Attempting IP rotation for {interface_name}.", interface=interface_name)
         
         if not is_command_available("mmcli"):
             raise Exception("`mmcli` is required for IP rotation. Modem must be managed by ModemManager.")
@@ -479,18 +1378,152 @@ def rotate_ip(interface_name):
         
         run_command(['sleep', '5'], timeout=10)
 
-        restart_result = proxy_action('restart', interface_name)
-        if not restart_result['success']:
-             raise Exception(f"IP rotation seems successful, but failed to restart proxy: {restart_result['error']}")
+        # Rewrites the config with the new IP and restarts the proxy only if it actually changed.
+        reconcile_result = reconcile_proxies(interface_name)
+        if not reconcile_result['success']:
+             raise Exception(f"IP rotation seems successful, but failed to restart proxy: {reconcile_result['error']}")
 
         final_statuses = get_all_modem_statuses()
         final_modem = next((m for m in final_statuses.get('data', []) if m['interfaceName'] == interface_name), None)
         new_ip = final_modem.get('ipAddress', 'unknown') if final_modem else 'unknown'
 
-        log_message("INFO", f"IP rotated for {interface_name}. New IP: {new_ip}.")
+        log_message("INFO", f"IP rotated for {interface_name}. New IP: {new_ip}.", interface=interface_name)
         return {"success": True, "data": {"message": f"IP rotated for {interface_name}, new IP is {new_ip}.", "newIp": new_ip}}
     except Exception as e:
-        log_message("ERROR", f"IP rotation for {interface_name} failed: {e}")
+        log_message("ERROR", f"IP rotation for {interface_name} failed: {e}", interface=interface_name)
+        return {"success": False, "error": str(e)}
+
+# --- Traffic Quotas ---
+# Per-interface limits live under the "quota" key of proxy_configs.json, e.g.
+#   "quota": {"dailyLimitMB": 1024, "monthlyLimitMB": 30000, "rateLimitKbps": 0,
+#             "onExceed": "throttle", "throttleKbps": 256}
+# "onExceed" is "throttle" (3proxy bandlim rules) or "stop" (stop the proxy). A throttled
+# proxy without a "throttleKbps" is limited to QUOTA_DEFAULT_THROTTLE_KBPS.
+# The engine records its decision as "quotaState" ("throttled", "stopped" or None).
+
+def get_proxy_rate_limit_kbps(config):
+    """Returns the bandwidth limit to apply to a proxy in kbps, or 0 for unlimited."""
+    quota = config.get('quota') or {}
+    if config.get('quotaState') == 'throttled':
+        return int(quota.get('throttleKbps') or QUOTA_DEFAULT_THROTTLE_KBPS)
+    return int(quota.get('rateLimitKbps') or 0)
+
+def read_interface_counters(interface_name):
+    """Reads the kernel rx/tx byte counters of an interface from sysfs, or None if it is absent."""
+    stats_dir = SYSFS_NET_DIR / interface_name / "statistics"
+    rx_bytes = read_sysfs_value(stats_dir / "rx_bytes")
+    tx_bytes = read_sysfs_value(stats_dir / "tx_bytes")
+    if rx_bytes is None or tx_bytes is None:
+        return None
+    return int(rx_bytes), int(tx_bytes)
+
+def update_interface_usage(entry, counters, now):
+    """Adds the traffic since the last sample to the daily and monthly totals of a usage entry.
+    Counter resets (replug, reboot) are treated as starting from zero. Returns True if changed."""
+    rx_bytes, tx_bytes = counters
+    day, month = now.strftime('%Y-%m-%d'), now.strftime('%Y-%m')
+    changed = False
+
+    if entry.get('day') != day:
+        entry['day'], entry['dayBytes'] = day, 0
+        changed = True
+    if entry.get('month') != month:
+        entry['month'], entry['monthBytes'] = month, 0
+        changed = True
+
+    if 'lastRx' in entry:
+        delta = (rx_bytes - entry['lastRx'] if rx_bytes >= entry['lastRx'] else rx_bytes) + \
+                (tx_bytes - entry['lastTx'] if tx_bytes >= entry['lastTx'] else tx_bytes)
+    else:
+        delta = 0
+    if delta or entry.get('lastRx') != rx_bytes or entry.get('lastTx') != tx_bytes:
+        entry['dayBytes'] += delta
+        entry['monthBytes'] += delta
+        entry['lastRx'], entry['lastTx'] = rx_bytes, tx_bytes
+        changed = True
+    return changed
+
+def get_quota_state(quota, entry):
+    """Returns the enforcement state a usage entry calls for under a quota config."""
+    daily_limit = quota.get('dailyLimitMB')
+    monthly_limit = quota.get('monthlyLimitMB')
+    exceeded = (daily_limit and entry.get('dayBytes', 0) >= daily_limit * 1024**2) or \
+               (monthly_limit and entry.get('monthBytes', 0) >= monthly_limit * 1024**2)
+    if not exceeded:
+        return None
+    return 'stopped' if quota.get('onExceed') == 'stop' else 'throttled'
+
+def check_quotas():
+    """Accounts traffic for every configured interface and enforces quotas.
+
+    Usage is accumulated from the kernel counters as deltas since the previous check,
+    so a check only reads two sysfs files per interface and forks nothing. Proxy configs
+    are only touched, and the reconciler only run, when an interface crosses a threshold
+    (or a new day/month lifts one). The whole check holds the proxy configs lock, so
+    neither a UI edit nor a concurrent check (watcher and timer) is lost."""
+    try:
+        with ProxyConfigsLock():
+            proxy_configs = read_state_file(PROXY_CONFIGS_FILE, strict=True)
+            usage = read_state_file(QUOTA_USAGE_FILE)
+            now = datetime.datetime.now()
+            usage_changed = False
+            transitions = []
+
+            for interface_name, config in proxy_configs.items():
+                counters = read_interface_counters(interface_name)
+                if counters is not None:
+                    usage_changed |= update_interface_usage(usage.setdefault(interface_name, {}), counters, now)
+
+                quota = config.get('quota')
+                new_state = get_quota_state(quota, usage.get(interface_name, {})) if quota else None
+                old_state = config.get('quotaState')
+                if new_state != old_state:
+                    config['quotaState'] = new_state
+                    if old_state == 'stopped':
+                        config['enabled'] = True
+                    transitions.append(interface_name)
+                    log_message("WARN" if new_state else "INFO",
+                                f"Quota state for {interface_name} changed from {old_state} to {new_state}.",
+                                interface=interface_name, action='quota')
+                # Keep a quota-stopped proxy stopped even if it is started manually.
+                if new_state == 'stopped' and config.get('enabled') is not False:
+                    config['enabled'] = False
+                    if interface_name not in transitions:
+                        transitions.append(interface_name)
+
+            if usage_changed:
+                write_state_file(QUOTA_USAGE_FILE, usage)
+            if transitions:
+                write_state_file(PROXY_CONFIGS_FILE, proxy_configs)
+                reconcile_result = reconcile_proxies()
+                if not reconcile_result['success']:
+                    raise Exception(f"Failed to apply quota changes: {reconcile_result['error']}")
+
+        return {"success": True, "data": {"changed": transitions}}
+    except Exception as e:
+        log_message("ERROR", f"Quota check failed: {e}")
+        return {"success": False, "error": str(e)}
+
+def get_quota_usage():
+    """Returns the accounted usage, limits and enforcement state for every configured interface."""
+    try:
+        proxy_configs = read_state_file(PROXY_CONFIGS_FILE, strict=True)
+        usage = read_state_file(QUOTA_USAGE_FILE)
+        data = []
+        for interface_name, config in proxy_configs.items():
+            entry = usage.get(interface_name, {})
+            data.append({
+                "interfaceName": interface_name,
+                "day": entry.get('day'),
+                "dayBytes": entry.get('dayBytes', 0),
+                "month": entry.get('month'),
+                "monthBytes": entry.get('monthBytes', 0),
+                "quota": config.get('quota'),
+                "quotaState": config.get('quotaState'),
+            })
+        return {"success": True, "data": data}
+    except Exception as e:
+        log_message("ERROR", f"Failed to read quota usage: {e}")
         return {"success": False, "error": str(e)}
 
 # --- Tunnel Management ---
@@ -516,6 +1549,8 @@ def is_pid_running(pid):
 
 def start_tunnel(tunnel_id, local_port, linked_to, tunnel_type, cloudflare_id=None):
     """Starts a tunnel and saves its PID."""
+    import signal
+    import subprocess
     pids = get_tunnel_pids()
     if tunnel_id in pids and is_pid_running(pids[tunnel_id].get('pid')):
         log_message("INFO", f"Tunnel {tunnel_id} is already running.")
@@ -572,6 +1607,7 @@ def start_tunnel(tunnel_id, local_port, linked_to, tunnel_type, cloudflare_id=No
 
 def stop_tunnel(tunnel_id):
     """Stops a tunnel using its saved PID."""
+    import signal
     pids = get_tunnel_pids()
     tunnel_info = pids.get(tunnel_id)
     if not tunnel_info or not is_pid_running(tunnel_info.get('pid')):
@@ -672,72 +1708,186 @@ def get_vnstat_stats(interface_name):
         
         return {"success": True, "data": combined_stats}
     except Exception as e:
-        log_message("ERROR", f"Failed to get vnstat stats for {interface_name}: {e}")
+        log_message("ERROR", f"Failed to get vnstat stats for {interface_name}: {e}", interface=interface_name)
         return {"success": False, "error": str(e)}
 
 # --- System & Config Functions ---
+def log_row_to_entry(row):
+    """Converts an activity_log row to the JSON shape returned to the UI."""
+    return {
+        "id": row['id'],
+        "timestamp": row['timestamp'],
+        "level": row['level'],
+        "message": row['message'],
+        "interface": row['interface'],
+        "action": row['action'],
+        "durationMs": row['duration_ms'],
+        "outcome": row['outcome'],
+    }
+
 def get_logs():
-    """Reads the last N lines from the log file."""
+    """Reads the last LOG_MAX_ENTRIES records from the activity history, oldest first."""
+    flush_log()
     try:
-        if not LOG_FILE.exists():
-            return {"success": True, "data": []}
-        
-        with open(LOG_FILE, 'r') as f:
-            lines = f.readlines()
-        
-        log_entries = [json.loads(line.strip()) for line in lines if line.strip()]
-        return {"success": True, "data": log_entries}
+        conn = open_log_store()
+        try:
+            rows = conn.execute(
+                "SELECT * FROM (SELECT * FROM activity_log ORDER BY ts DESC, id DESC LIMIT ?) ORDER BY ts, id",
+                (LOG_MAX_ENTRIES,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return {"success": True, "data": [log_row_to_entry(row) for row in rows]}
     except Exception as e:
         return {"success": False, "error": f"Failed to read log file: {e}"}
 
+def build_log_filters(filters):
+    """Builds a SQL WHERE clause and parameters from activity history query filters.
+    Supported filters: since/until (ISO timestamps, read as UTC when they have no offset), level, interface, action and outcome
+    (a value or a list of values), and search (substring of the message)."""
+    clauses, params = [], []
+    for key, operator in (('since', '>='), ('until', '<=')):
+        if filters.get(key):
+            epoch = parse_iso_timestamp(filters[key])
+            if epoch is None:
+                raise Exception(f"Invalid '{key}' timestamp: {filters[key]}")
+            clauses.append(f"ts {operator} ?")
+            params.append(epoch)
+    for key in ('level', 'interface', 'action', 'outcome'):
+        value = filters.get(key)
+        if not value:
+            continue
+        values = value if isinstance(value, list) else [value]
+        clauses.append(f"{key} IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+    if filters.get('search'):
+        clauses.append("message LIKE ?")
+        params.append(f"%{filters['search']}%")
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+# Columns activity history counts can be grouped by, and the supported time buckets.
+LOG_GROUP_COLUMNS = ('level', 'interface', 'action', 'outcome')
+LOG_TIME_BUCKETS = {
+    'hour': '%Y-%m-%dT%H:00:00Z',
+    'day': '%Y-%m-%d',
+    'month': '%Y-%m',
+}
+
+def query_logs(filters_json):
+    """Queries the activity history with filters and pagination, newest first.
+
+    With "groupBy" (a list of LOG_GROUP_COLUMNS) and/or "bucket" ("hour", "day" or
+    "month"), returns aggregated counts instead of entries, e.g. rotations per modem
+    per hour: {"action": "rotate_ip", "groupBy": ["interface"], "bucket": "hour"}."""
+    try:
+        filters = json.loads(filters_json)
+        where, params = build_log_filters(filters)
+        group_by = filters.get('groupBy') or []
+        bucket = filters.get('bucket')
+        if any(column not in LOG_GROUP_COLUMNS for column in group_by):
+            raise Exception(f"Can only group by: {', '.join(LOG_GROUP_COLUMNS)}")
+        if bucket and bucket not in LOG_TIME_BUCKETS:
+            raise Exception(f"Unknown bucket '{bucket}'. Use one of: {', '.join(LOG_TIME_BUCKETS)}")
+
+        flush_log()
+        conn = open_log_store()
+        try:
+            if group_by or bucket:
+                columns = list(group_by)
+                if bucket:
+                    columns.insert(0, f"strftime('{LOG_TIME_BUCKETS[bucket]}', ts, 'unixepoch') AS bucket")
+                keys = (['bucket'] if bucket else []) + list(group_by)
+                rows = conn.execute(
+                    f"SELECT {', '.join(columns)}, COUNT(*) AS count, AVG(duration_ms) AS avgDurationMs "
+                    f"FROM activity_log {where} GROUP BY {', '.join(keys)} ORDER BY {', '.join(keys)}",
+                    params
+                ).fetchall()
+                return {"success": True, "data": {"groups": [dict(row) for row in rows]}}
+
+            limit = int(filters.get('limit', LOG_PAGE_SIZE))
+            offset = int(filters.get('offset', 0))
+            total = conn.execute(f"SELECT COUNT(*) FROM activity_log {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT * FROM activity_log {where} ORDER BY ts DESC, id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        finally:
+            conn.close()
+        return {"success": True, "data": {"entries": [log_row_to_entry(row) for row in rows], "total": total}}
+    except Exception as e:
+        log_message("ERROR", f"Failed to query logs: {e}", action='query_logs', outcome='failure')
+        return {"success": False, "error": str(e)}
+
 def get_all_configs():
     """Reads the entire proxy_configs.json file."""
     try:
-        configs = read_state_file(PROXY_CONFIGS_FILE)
+        configs = read_state_file(PROXY_CONFIGS_FILE, strict=True)
         return {"success": True, "data": configs}
     except Exception as e:
         log_message("ERROR", f"Failed to read proxy configs file: {e}")
         return {"success": False, "error": f"Failed to read proxy configs file: {e}"}
 
+def describe_config_changes(updates, changed_keys):
+    """Describes changed config values for the activity log, without proxy credentials."""
+    if not changed_keys:
+        return "no changes"
+    return ", ".join(f"{key}=<redacted>" if key in CREDENTIAL_CONFIG_KEYS else f"{key}={updates[key]!r}"
+                     for key in changed_keys)
+
 def update_proxy_config(interface_name, updates_json):
     """Updates config for an interface and restarts the proxy if running."""
     try:
         updates = json.loads(updates_json)
-        all_configs = read_state_file(PROXY_CONFIGS_FILE)
+        with ProxyConfigsLock():
+            all_configs = read_state_file(PROXY_CONFIGS_FILE, strict=True)
         
-        if interface_name not in all_configs:
-            all_configs[interface_name] = {}
-            
-        is_credential_update = 'username' in updates or 'password' in updates
-        
-        for key, value in updates.items():
-            all_configs[interface_name][key] = value
+            if interface_name not in all_configs:
+                all_configs[interface_name] = {}
+
+            changed_keys = [key for key, value in updates.items() if all_configs[interface_name].get(key) != value]
+            for key, value in updates.items():
+                all_configs[interface_name][key] = value
             
-        write_state_file(PROXY_CONFIGS_FILE, all_configs)
-        log_message("INFO", f"Updated config for {interface_name} with: {updates}")
+            write_state_file(PROXY_CONFIGS_FILE, all_configs)
+            log_message("INFO", f"Updated config for {interface_name}: {describe_config_changes(updates, changed_keys)}",
+                        interface=interface_name)
         
-        # If credentials were changed, restart the proxy to apply them
-        if is_credential_update and get_proxy_status(interface_name) == 'running':
-            log_message("INFO", f"Credentials changed for {interface_name}. Restarting proxy to apply.")
-            proxy_action('restart', interface_name)
+            # Apply the change; the proxy is restarted only if its generated config actually changed.
+            reconcile_result = reconcile_proxies(interface_name)
+            if not reconcile_result['success']:
+                raise Exception(f"Config saved, but applying it to the proxy failed: {reconcile_result['error']}")
 
         return {"success": True, "data": all_configs[interface_name]}
     except Exception as e:
-        log_message("ERROR", f"Failed to update config for {interface_name}: {e}")
+        log_message("ERROR", f"Failed to update config for {interface_name}: {e}", interface=interface_name)
         return {"success": False, "error": str(e)}
 
 # --- Main Execution Block ---
 
+# Actions whose first argument is an interface name, recorded in the per-call log record.
+INTERFACE_ACTIONS = {
+    'rotate_ip', 'start', 'stop', 'restart', 'send-sms', 'read-sms', 'send-ussd',
+    'get_vnstat_stats', 'update_proxy_config', 'reconcile',
+}
+# Frequently polled actions that change nothing; only their failures get a per-call record.
+READ_ONLY_ACTIONS = {
+    'get_all_modem_statuses', 'get_all_tunnel_statuses', 'get_available_cloudflare_tunnels',
+    'get_vnstat_interfaces', 'get_vnstat_stats', 'get_logs', 'query_logs', 'get_all_configs',
+    'get_modem_inventory', 'get_quota_usage', 'search-sms', 'read-sms',
+}
+
 def main():
     if len(sys.argv) < 2:
         print(json.dumps({"success": False, "error": "No action specified."}))
         sys.exit(1)
 
+    import time
+
     action = sys.argv[1]
     result = {}
+    started_at = time.perf_counter()
 
     try:
-        log_message("DEBUG", f"Backend action '{action}' called.")
         if action == 'get_all_modem_statuses':
             result = get_all_modem_statuses()
         elif action == 'rotate_ip':
@@ -746,6 +1896,8 @@ def main():
             result = proxy_action(action, sys.argv[2])
         elif action in ['send-sms', 'read-sms', 'send-ussd']:
             result = modem_action(action, sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else '{}')
+        elif action in ['sync-sms', 'search-sms']:
+            result = sms_store_action(action, sys.argv[2] if len(sys.argv) > 2 else '{}')
         elif action == 'start_tunnel':
             tunnel_id = sys.argv[2]
             local_port = int(sys.argv[3])
@@ -765,10 +1917,22 @@ def main():
             result = get_vnstat_stats(sys.argv[2])
         elif action == 'get_logs':
             result = get_logs()
+        elif action == 'query_logs':
+            result = query_logs(sys.argv[2] if len(sys.argv) > 2 else '{}')
         elif action == 'get_all_configs':
             result = get_all_configs()
         elif action == 'update_proxy_config':
             result = update_proxy_config(sys.argv[2], sys.argv[3])
+        elif action == 'get_modem_inventory':
+            result = get_modem_inventory()
+        elif action == 'watch_modem_inventory':
+            result = watch_modem_inventory()
+        elif action == 'check_quotas':
+            result = check_quotas()
+        elif action == 'get_quota_usage':
+            result = get_quota_usage()
+        elif action == 'reconcile':
+            result = reconcile_proxies(sys.argv[2] if len(sys.argv) > 2 else None)
         else:
             result = {"success": False, "error": f"Unknown action: {action}"}
     
@@ -776,7 +1940,23 @@ def main():
         log_message("ERROR", f"An unexpected error occurred in main for action '{action}': {e}")
         result = {"success": False, "error": f"An unexpected error occurred in main: {str(e)}"}
 
+    # One structured record per call, so history can be filtered and aggregated by action and outcome.
+    # Successful read-only polls are skipped: they are most calls, and recording them would put a
+    # database write on every UI refresh.
+    succeeded = result.get('success', False)
+    if not (succeeded and action in READ_ONLY_ACTIONS):
+        log_message(
+            "INFO",
+            f"Backend action '{action}' {'succeeded' if succeeded else 'failed'}.",
+            interface=sys.argv[2] if action in INTERFACE_ACTIONS and len(sys.argv) > 2 else None,
+            action=action,
+            duration_ms=round((time.perf_counter() - started_at) * 1000, 1),
+            outcome='success' if succeeded else 'failure',
+        )
+
     print(json.dumps(result))
+    sys.stdout.flush()
+    flush_log()
 
 if __name__ == "__main__":
     main()
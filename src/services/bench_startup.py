@@ -0,0 +1,89 @@
+
+# src/services/bench_startup.py
+# Measures the cold-start latency of backend_controller.py for the actions the UI calls most.
+# Each run is a fresh interpreter, exactly like a PythonShell invocation. Runs use a temporary
+# HOME so the benchmark does not touch the real application state.
+#
+# Usage:
+#   python3 src/services/bench_startup.py                   # default actions, 10 runs each
+#   python3 src/services/bench_startup.py get_logs -n 20    # specific actions
+#   python3 src/services/bench_startup.py --max-ms 80       # fail if any median exceeds 80 ms
+#   python3 src/services/bench_startup.py --importtime      # also show the slowest imports (python -X importtime)
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CONTROLLER = Path(__file__).resolve().parent / "backend_controller.py"
+
+# Read-only actions the dashboard, proxy and logs pages fire on every load or poll.
+DEFAULT_ACTIONS = ['get_all_configs', 'get_logs', 'get_all_tunnel_statuses', 'get_all_modem_statuses']
+
+IMPORTTIME_TOP = 10
+
+
+def time_action(action, runs, env):
+    """Runs an action `runs` times in fresh interpreters and returns the wall times in ms."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, str(CONTROLLER), action], env=env, capture_output=True, timeout=60)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def slowest_imports(action, env):
+    """Runs an action once under -X importtime and returns (total_ms, [(cumulative_ms, module)])."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', str(CONTROLLER), action],
+        env=env, capture_output=True, text=True, timeout=60
+    )
+    top_level = []
+    for line in result.stderr.splitlines():
+        # Format: "import time: <self us> | <cumulative us> | <indented module name>"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):
+            top_level.append((int(cumulative) / 1000, name.strip()))
+    top_level.sort(reverse=True)
+    return sum(ms for ms, _ in top_level), top_level[:IMPORTTIME_TOP]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend_controller.py cold-start latency.")
+    parser.add_argument('actions', nargs='*', default=DEFAULT_ACTIONS, help="Actions to benchmark.")
+    parser.add_argument('-n', '--runs', type=int, default=10, help="Runs per action (default: 10).")
+    parser.add_argument('--max-ms', type=float, help="Exit non-zero if any action's median exceeds this.")
+    parser.add_argument('--importtime', action='store_true', help="Show the slowest top-level imports per action.")
+    args = parser.parse_args()
+
+    over_budget = []
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home)
+        print(f"{'action':<28} {'median':>9} {'min':>9} {'max':>9}")
+        for action in args.actions:
+            timings = time_action(action, args.runs, env)
+            median = statistics.median(timings)
+            print(f"{action:<28} {median:>7.1f}ms {min(timings):>7.1f}ms {max(timings):>7.1f}ms")
+            if args.max_ms is not None and median > args.max_ms:
+                over_budget.append(action)
+
+            if args.importtime:
+                total_ms, top = slowest_imports(action, env)
+                print(f"  imports: {total_ms:.1f}ms total")
+                for ms, module in top:
+                    print(f"    {ms:>7.1f}ms  {module}")
+
+    if over_budget:
+        print(f"Over the {args.max_ms}ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
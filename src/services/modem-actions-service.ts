@@ -35,11 +35,22 @@ async function runPythonScript(args: string[]): Promise<any> {
 
 export interface SmsMessage {
     id: string;
+    interfaceName: string;
     from: string;
     timestamp: string;
     content: string;
 }
 
+export interface SmsSearchFilters {
+    interface?: string;
+    number?: string;
+    text?: string;
+    since?: string;
+    until?: string;
+    limit?: number;
+    offset?: number;
+}
+
 /**
  * Sends an SMS message via a modem interface.
  * @param interfaceName The modem interface (e.g., 'ppp0').
@@ -54,15 +65,35 @@ export async function sendSms(interfaceName: string, recipient: string, message:
 }
 
 /**
- * Reads all SMS messages from a modem interface.
+ * Reads SMS messages for a modem interface from the local message store.
+ * New messages on the SIM are fetched into the store first; history is kept after they are deleted from the SIM.
  * @param interfaceName The modem interface (e.g., 'ppp0').
- * @returns A promise that resolves to an array of SMS messages.
+ * @param filters Optional number/text/time filters and pagination. Without a limit, every stored message is returned.
+ * @returns A promise that resolves to an array of SMS messages, newest first.
  */
-export async function readSms(interfaceName: string): Promise<SmsMessage[]> {
-    const data = await runPythonScript(['read-sms', interfaceName, '{}']);
+export async function readSms(interfaceName: string, filters: Omit<SmsSearchFilters, 'interface'> = {}): Promise<SmsMessage[]> {
+    const data = await runPythonScript(['read-sms', interfaceName, JSON.stringify(filters)]);
     return data;
 }
 
+/**
+ * Fetches new SMS messages from all modems (or the given ones) into the local message store.
+ * @param interfaces Optional list of modem interfaces to sync.
+ * @returns A promise that resolves to the number of new messages per interface.
+ */
+export async function syncSms(interfaces?: string[]): Promise<Record<string, number>> {
+    return await runPythonScript(['sync-sms', JSON.stringify(interfaces ? { interfaces } : {})]);
+}
+
+/**
+ * Searches the local SMS message store without contacting any modem.
+ * @param filters Interface, number, text and time filters, plus pagination.
+ * @returns A promise that resolves to an array of SMS messages, newest first.
+ */
+export async function searchSms(filters: SmsSearchFilters): Promise<SmsMessage[]> {
+    return await runPythonScript(['search-sms', JSON.stringify(filters)]);
+}
+
 /**
  * Sends a USSD command via a modem interface.
  * @param interfaceName The modem interface (e.g., 'ppp0').
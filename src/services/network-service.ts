@@ -36,6 +36,18 @@ export async function getCurrentIpAddress(interfaceName: string): Promise<string
   return modem?.ipAddress || '127.0.0.1'; // Default fallback
 }
 
+export interface ModemDevice {
+  interfaceName: string;
+  address: string | null;
+  type: number;
+  devtype: string | null;
+  driver: string | null;
+  bus: 'usb' | null;
+  usbPath: string | null;
+  vendorId: string | null;
+  productId: string | null;
+}
+
 export interface ModemStatus {
   id: string;
   name: string;
@@ -44,7 +56,8 @@ export interface ModemStatus {
   ipAddress: string | null;
   proxyType: '3proxy';
   proxyStatus: 'running' | 'stopped' | 'error';
-  source: 'ip_addr' | 'mmcli_enhanced';
+  source: 'inventory' | 'ip_addr' | 'mmcli_enhanced';
+  device: ModemDevice | null;
   bandwidth: {
     totalRx: string | null;
     totalTx: string | null;
@@ -66,6 +79,10 @@ export async function getAllModemStatuses(): Promise<ModemStatus[]> {
     return await runPythonScript(['get_all_modem_statuses']);
 }
 
+export async function getModemInventory(): Promise<ModemDevice[]> {
+    return await runPythonScript(['get_modem_inventory']);
+}
+
 export async function rotateIp(interfaceName: string): Promise<string> {
     const result = await runPythonScript(['rotate_ip', interfaceName]);
     return result.newIp;
@@ -3,6 +3,7 @@
 
 import { PythonShell } from 'python-shell';
 import path from 'path';
+import type { QuotaConfig } from './stats-service';
 
 async function runPythonScript(args: string[]): Promise<any> {
   const options = {
@@ -56,6 +57,26 @@ export interface ProxyConfig {
     username?: string;
     password?: string;
     customName?: string | null;
+    enabled?: boolean;
+    quota?: QuotaConfig;
+    quotaState?: 'throttled' | 'stopped' | null;
+}
+
+export interface ReconcileSummary {
+    written: string[];
+    restarted: string[];
+    started: string[];
+    stopped: string[];
+    removed: string[];
+    // Running proxies stopped because their modem was unplugged or lost its IP.
+    disconnected: string[];
+    failed: string[];
+    unchanged: number;
+}
+
+export async function reconcileProxies(interfaceName?: string): Promise<ReconcileSummary> {
+    // Only rewrites configs and restarts units that actually drifted; safe to call repeatedly.
+    return await runPythonScript(interfaceName ? ['reconcile', interfaceName] : ['reconcile']);
 }
 
 export async function getProxyConfig(interfaceName: string): Promise<ProxyConfig | null> {
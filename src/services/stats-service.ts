@@ -54,3 +54,30 @@ export async function getNetworkInterfaces(): Promise<string[]> {
 export async function getStatsForInterface(interfaceName: string): Promise<VnstatData> {
     return await runPythonScript(['get_vnstat_stats', interfaceName]);
 }
+
+
+export interface QuotaConfig {
+    dailyLimitMB?: number;
+    monthlyLimitMB?: number;
+    rateLimitKbps?: number;
+    onExceed?: 'throttle' | 'stop';
+    throttleKbps?: number;
+}
+
+export interface QuotaUsage {
+    interfaceName: string;
+    day: string | null;
+    dayBytes: number;
+    month: string | null;
+    monthBytes: number;
+    quota: QuotaConfig | null;
+    quotaState: 'throttled' | 'stopped' | null;
+}
+
+/**
+ * Fetches accounted daily/monthly traffic, quota limits and enforcement state for every configured interface.
+ * @returns A promise that resolves to an array of per-interface quota usage.
+ */
+export async function getQuotaUsage(): Promise<QuotaUsage[]> {
+    return await runPythonScript(['get_quota_usage']);
+}
@@ -30,9 +30,43 @@ async function runPythonScript(args: string[]): Promise<any> {
 }
 
 export interface LogEntry {
+    id: number;
     timestamp: string;
     level: 'INFO' | 'WARN' | 'ERROR' | 'DEBUG';
     message: string;
+    interface: string | null;
+    action: string | null;
+    durationMs: number | null;
+    outcome: 'success' | 'failure' | null;
+}
+
+export type LogGroupColumn = 'level' | 'interface' | 'action' | 'outcome';
+
+export interface LogQuery {
+    since?: string;
+    until?: string;
+    level?: LogEntry['level'] | LogEntry['level'][];
+    interface?: string | string[];
+    action?: string | string[];
+    outcome?: 'success' | 'failure';
+    search?: string;
+    limit?: number;
+    offset?: number;
+}
+
+export interface LogAggregateQuery extends Omit<LogQuery, 'limit' | 'offset'> {
+    groupBy?: LogGroupColumn[];
+    bucket?: 'hour' | 'day' | 'month';
+}
+
+export interface LogGroup {
+    bucket?: string;
+    level?: string;
+    interface?: string | null;
+    action?: string | null;
+    outcome?: string | null;
+    count: number;
+    avgDurationMs: number | null;
 }
 
 /**
@@ -42,3 +76,23 @@ export interface LogEntry {
 export async function getSystemLogs(): Promise<LogEntry[]> {
     return await runPythonScript(['get_logs']);
 }
+
+/**
+ * Queries the activity history with time-range and field filters, newest first.
+ * @param query Filters and pagination.
+ * @returns A promise that resolves to a page of log entries and the total number of matches.
+ */
+export async function queryLogs(query: LogQuery = {}): Promise<{ entries: LogEntry[]; total: number }> {
+    return await runPythonScript(['query_logs', JSON.stringify(query)]);
+}
+
+/**
+ * Aggregates the activity history into counts, e.g. rotations per modem per hour:
+ * `{ action: 'rotate_ip', groupBy: ['interface'], bucket: 'hour' }`.
+ * @param query Filters plus the columns and/or time bucket to group by.
+ * @returns A promise that resolves to the grouped counts.
+ */
+export async function aggregateLogs(query: LogAggregateQuery): Promise<LogGroup[]> {
+    const data = await runPythonScript(['query_logs', JSON.stringify(query)]);
+    return data.groups;
+}